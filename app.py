@@ -6,7 +6,10 @@ import tempfile
 from dotenv import load_dotenv
 import requests
 import urllib.parse
+import io
 from openai import OpenAI  # ← ADD THIS IMPORT
+from tts_bundle import lookup_bundled_speech, get_template_translation
+from db_retention import DATABASE_PATH, ensure_retention_schema, record_chat, start_retention_worker
 
 # Load environment variables
 load_dotenv()
@@ -16,6 +19,7 @@ OPENAI_API_KEY = "API KEY"  # REPLACE WITH YOUR ACTUAL API KEY
 client = OpenAI(api_key=OPENAI_API_KEY)
 
 app = Flask(__name__)
+DEBUG = True
 
 # Enhanced Language configurations with OpenAI voices
 LANGUAGES = {
@@ -25,9 +29,13 @@ LANGUAGES = {
     'kn': {'name': 'ಕನ್ನಡ', 'openai_voice': 'shimmer'}
 }
 
+# OpenAI TTS settings shared by /api/speak and the offline pre-synthesis job
+TTS_MODEL = "tts-1-hd"  # High quality model for natural sound
+TTS_SPEED = 0.9  # Slightly slower for better clarity
+
 def get_db_connection():
     try:
-        conn = sqlite3.connect('careermate.db')
+        conn = sqlite3.connect(DATABASE_PATH)
         conn.row_factory = sqlite3.Row
         return conn
     except Exception as e:
@@ -61,14 +69,17 @@ def init_database():
                 )
             ''')
             
+            # Response dedup table, WAL mode and indexes used by retention
+            ensure_retention_schema(conn)
+            
             conn.commit()
             conn.close()
             print("✅ Database initialized successfully")
     except Exception as e:
         print(f"Database initialization error: {e}")
 
-def translate_single_chunk(text, target):
-    """Enhanced translation with better error handling"""
+def translate_single_chunk(text, target, strict=False):
+    """Enhanced translation with better error handling (strict raises instead of falling back to English)"""
     try:
         if len(text.strip()) == 0:
             return text
@@ -84,17 +95,24 @@ def translate_single_chunk(text, target):
             data = response.json()
             if 'responseData' in data and 'translatedText' in data['responseData']:
                 translated = data['responseData']['translatedText']
+                # Quota and other API errors still come back as HTTP 200
+                if strict and (data.get('responseStatus') not in (200, '200') or translated.upper().startswith('MYMEMORY WARNING')):
+                    raise RuntimeError(f"MyMemory error {data.get('responseStatus')}: {translated[:80]}")
                 # Clean up translation
                 return translated.replace('  ', ' ').strip()
         
+        if strict:
+            raise RuntimeError(f"MyMemory HTTP {response.status_code}")
         return text
             
     except Exception as e:
         print(f"❌ Chunk translation error: {e}")
+        if strict:
+            raise
         return text
 
-def translate_text_smart(text, target_language='en'):
-    """Enhanced smart translation with better chunking"""
+def translate_text_smart(text, target_language='en', strict=False):
+    """Enhanced smart translation with better chunking (strict raises if any chunk fails)"""
     if target_language == 'en' or not text.strip():
         return text
         
@@ -104,7 +122,7 @@ def translate_text_smart(text, target_language='en'):
         
         # For very short text, translate directly
         if len(text) <= 200:
-            return translate_single_chunk(text, target)
+            return translate_single_chunk(text, target, strict)
         
         # Enhanced chunking logic
         chunks = []
@@ -154,13 +172,15 @@ def translate_text_smart(text, target_language='en'):
         for i, chunk in enumerate(chunks):
             if chunk.strip():
                 print(f"Translating chunk {i+1}/{len(chunks)}: {chunk[:50]}...")
-                translated = translate_single_chunk(chunk, target)
+                translated = translate_single_chunk(chunk, target, strict)
                 translated_parts.append(translated)
         
         return '\n\n'.join(translated_parts)
                 
     except Exception as e:
         print(f"Translation error: {e}")
+        if strict:
+            raise
         return text
 
 def detect_intent_multilingual(user_message):
@@ -220,18 +240,9 @@ def detect_intent_multilingual(user_message):
     else:
         return 'default'
 
-def get_ai_response(user_message, language='en'):
-    """Enhanced AI responses with better formatting"""
-    
-    print(f"🔍 Processing: {user_message}")
-    print(f"🌍 Language: {language}")
-    
-    intent = detect_intent_multilingual(user_message)
-    print(f"🎯 Detected intent: {intent}")
-    
-    # More structured responses
-    if intent == 'greeting':
-        english_response = """👋 **Hello! I'm CareerMate!**
+# Fixed English response templates per intent ('default' echoes the user message, so it stays inline)
+RESPONSE_TEMPLATES = {
+    'greeting': """👋 **Hello! I'm CareerMate!**
 
 I help with:
 • Job search & salaries
@@ -241,10 +252,9 @@ I help with:
 
 Ask me about salaries, skills, or jobs!
 
-What can I help you with?"""
+What can I help you with?""",
 
-    elif intent == 'salary':
-        english_response = """💰 **Tech Salaries 2024-2025**
+    'salary': """💰 **Tech Salaries 2024-2025**
 
 **Software Engineer:**
 Entry: $75k-$120k | Mid: $110k-$180k | Senior: $160k-$350k
@@ -257,10 +267,9 @@ Entry: $85k-$120k | Mid: $120k-$180k | Senior: $180k-$300k
 
 **Location boost:** SF +35%, NYC +25%, Remote -15%
 
-Get multiple offers and negotiate!"""
+Get multiple offers and negotiate!""",
 
-    elif intent == 'skills':
-        english_response = """🎓 **Hottest Tech Skills 2024-2025**
+    'skills': """🎓 **Hottest Tech Skills 2024-2025**
 
 **Programming:** Python (AI/ML) • JavaScript (Web) • SQL (Essential)
 
@@ -272,10 +281,9 @@ Get multiple offers and negotiate!"""
 
 **Free resources:** freeCodeCamp.org, Fast.ai, AWS Educate
 
-Which area interests you?"""
+Which area interests you?""",
 
-    elif intent == 'interview':
-        english_response = """🎤 **Interview Prep Essentials**
+    'interview': """🎤 **Interview Prep Essentials**
 
 **Top 3 questions:**
 1. "Tell me about yourself" → Present + Impact + Future
@@ -286,10 +294,9 @@ Which area interests you?"""
 
 **Tips:** Apply Mon-Wed, research interviewer, prepare 5 questions
 
-Need company-specific help?"""
+Need company-specific help?""",
 
-    elif intent == 'job':
-        english_response = """🔍 **Job Search Strategy**
+    'job': """🔍 **Job Search Strategy**
 
 **Best Job Boards:**
 • LinkedIn Jobs (most active)
@@ -305,10 +312,9 @@ Need company-specific help?"""
 
 **Remote-friendly companies:** GitLab, Automattic, Buffer, Zapier
 
-Want specific company recommendations?"""
+Want specific company recommendations?""",
 
-    elif intent == 'resume':
-        english_response = """📄 **Resume Optimization**
+    'resume': """📄 **Resume Optimization**
 
 **Structure:** Header → Summary → Experience → Skills
 
@@ -324,8 +330,21 @@ Want specific company recommendations?"""
 
 **Test:** Upload to Jobscan.co for ATS score
 
-Want help with specific sections?"""
+Want help with specific sections?""",
+}
 
+def get_ai_response(user_message, language='en'):
+    """Enhanced AI responses with better formatting"""
+    
+    print(f"🔍 Processing: {user_message}")
+    print(f"🌍 Language: {language}")
+    
+    intent = detect_intent_multilingual(user_message)
+    print(f"🎯 Detected intent: {intent}")
+    
+    # More structured responses
+    if intent in RESPONSE_TEMPLATES:
+        english_response = RESPONSE_TEMPLATES[intent]
     else:
         english_response = f"""🤖 **Got it: "{user_message}"**
 
@@ -343,6 +362,12 @@ I help with:
 
 What do you need help with?"""
     
+    # Template translations stored by the TTS bundle build keep chat text and bundled audio in sync
+    if language != 'en' and intent in RESPONSE_TEMPLATES:
+        stored_translation = get_template_translation(intent, language, english_response)
+        if stored_translation:
+            return stored_translation
+    
     # Enhanced translation with better error handling
     if language != 'en':
         try:
@@ -356,21 +381,33 @@ What do you need help with?"""
     
     return english_response
 
+# Suggestion chips shown under each response, keyed by intent
+SUGGESTIONS_MAP = {
+    'skills': ['🐍 Python learning roadmap', '🤖 AI/ML fundamentals', '☁️ Cloud platforms guide', '💻 Full-stack development'],
+    'salary': ['💼 Entry-level tech salaries', '🏢 Big tech compensation', '📍 Location-based pay', '💰 Salary negotiation tips'],
+    'interview': ['❓ Common tech questions', '💡 STAR method examples', '🎯 System design basics', '👔 Behavioral interview prep'],
+    'resume': ['📄 Upload my resume now', '✨ Resume formatting tips', '🎯 ATS optimization guide', '💼 Cover letter tips'],
+    'job': ['🔍 Remote job opportunities', '🚀 Startup positions', '🏢 Big tech roles', '📈 Career transition tips'],
+    'greeting': ['💼 Career guidance', '📈 Skill development', '💰 Salary information', '🎤 Interview preparation'],
+    'default': ['🔍 Find me jobs', '📄 Analyze my resume', '🎤 Interview preparation', '📈 Career planning']
+}
+
 def generate_smart_suggestions(user_message, ai_response, language='en'):
     """Enhanced contextual suggestions"""
     intent = detect_intent_multilingual(user_message)
     
-    suggestions_map = {
-        'skills': ['🐍 Python learning roadmap', '🤖 AI/ML fundamentals', '☁️ Cloud platforms guide', '💻 Full-stack development'],
-        'salary': ['💼 Entry-level tech salaries', '🏢 Big tech compensation', '📍 Location-based pay', '💰 Salary negotiation tips'],
-        'interview': ['❓ Common tech questions', '💡 STAR method examples', '🎯 System design basics', '👔 Behavioral interview prep'],
-        'resume': ['📄 Upload my resume now', '✨ Resume formatting tips', '🎯 ATS optimization guide', '💼 Cover letter tips'],
-        'job': ['🔍 Remote job opportunities', '🚀 Startup positions', '🏢 Big tech roles', '📈 Career transition tips'],
-        'greeting': ['💼 Career guidance', '📈 Skill development', '💰 Salary information', '🎤 Interview preparation'],
-        'default': ['🔍 Find me jobs', '📄 Analyze my resume', '🎤 Interview preparation', '📈 Career planning']
-    }
-    
-    return suggestions_map.get(intent, suggestions_map['default'])
+    return SUGGESTIONS_MAP.get(intent, SUGGESTIONS_MAP['default'])
+
+def synthesize_speech(text, voice):
+    """Generate MP3 speech for text with OpenAI TTS"""
+    response = client.audio.speech.create(
+        model=TTS_MODEL,
+        voice=voice,
+        input=text,
+        response_format="mp3",
+        speed=TTS_SPEED
+    )
+    return response.content
 
 # Enhanced Routes with better error handling
 
@@ -453,11 +490,7 @@ def chat():
         try:
             conn = get_db_connection()
             if conn:
-                conn.execute(
-                    'INSERT INTO chats (user_message, bot_response, language, intent, timestamp) VALUES (?, ?, ?, ?, ?)',
-                    (user_message, bot_response, language, intent, datetime.now().isoformat())
-                )
-                conn.commit()
+                record_chat(conn, user_message, bot_response, language, intent, datetime.now().isoformat())
                 conn.close()
         except Exception as db_error:
             print(f"❌ Database error: {db_error}")
@@ -496,15 +529,33 @@ def text_to_speech():
         
         print(f"🎤 Using OpenAI voice: {selected_voice}")
         
+        # Serve pre-synthesized template audio straight from the bundle
+        bundled_audio = lookup_bundled_speech(text, language, selected_voice, TTS_MODEL, TTS_SPEED)
+        if bundled_audio:
+            try:
+                conn = get_db_connection()
+                if conn:
+                    conn.execute(
+                        'INSERT INTO voice_interactions (interaction_type, language, success, timestamp) VALUES (?, ?, ?, ?)',
+                        ('bundled_tts', language, True, datetime.now().isoformat())
+                    )
+                    conn.commit()
+                    conn.close()
+            except:
+                pass  # Don't fail TTS for logging issues
+            
+            print(f"⚡ Serving pre-synthesized audio ({len(bundled_audio)} bytes)")
+            
+            return send_file(
+                io.BytesIO(bundled_audio),
+                as_attachment=False,
+                mimetype='audio/mpeg',
+                download_name=f'careermate_speech_{language}.mp3'
+            )
+        
         try:
             # Generate speech using OpenAI's TTS
-            response = client.audio.speech.create(
-                model="tts-1-hd",  # High quality model for natural sound
-                voice=selected_voice,
-                input=text,
-                response_format="mp3",
-                speed=0.9  # Slightly slower for better clarity
-            )
+            audio_content = synthesize_speech(text, selected_voice)
             
             # Save to temporary file
             temp_file = tempfile.NamedTemporaryFile(
@@ -514,7 +565,7 @@ def text_to_speech():
             )
             
             # Write the audio content
-            temp_file.write(response.content)
+            temp_file.write(audio_content)
             temp_file.close()
             
             # Log successful TTS generation
@@ -659,11 +710,17 @@ if __name__ == '__main__':
     print("🚀 Starting Enhanced CareerMate AI Job Assistant...")
     print("🤖 Initializing database...")
     init_database()
+    # The debug reloader re-runs this block in a child; only archive from the serving process
+    retention_active = not DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+    if retention_active:
+        start_retention_worker()
     print("🌍 CareerMate Backend Started!")
     print("🗣️ OpenAI Natural Voice TTS enabled!")
     print("🔥 Smart multilingual translation active!")
     print("🎯 Advanced intent detection ready!")
     print("📊 Database logging enhanced!")
+    if retention_active:
+        print("🗄️ Chat retention and monthly archiving active!")
     print("🔧 Health monitoring enabled!")
     print("📍 Website: http://localhost:5000/web")
     print("📍 Health Check: http://localhost:5000/api/health")
@@ -671,7 +728,7 @@ if __name__ == '__main__':
     print("=" * 50)
     
     app.run(
-        debug=True, 
+        debug=DEBUG, 
         host='0.0.0.0', 
         port=5000,
         threaded=True  # Better performance for concurrent requests
@@ -0,0 +1,332 @@
+"""Retention and archival for careermate.db.
+
+Rows in ``chats`` and ``voice_interactions`` older than the retention window
+are moved, a small batch at a time, into one SQLite file per month under
+``ARCHIVE_DIR``. Bot responses are mostly the same translated templates, so
+both the live DB and the archives store each body once in a content-hash
+table (``response_bodies``) and chats only keep the hash. Archived bodies are
+zlib-compressed.
+
+Use ``connect_with_archives`` to query live and archived rows together
+(SQLite attaches at most 10 databases by default, so pick a month range):
+
+    conn = connect_with_archives(since='2024-01', until='2024-06')
+    conn.execute("SELECT * FROM all_chats WHERE intent = 'salary'")
+
+One-off pass from the command line:
+
+    python db_retention.py --days 90
+"""
+import argparse
+import glob
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+DATABASE_PATH = 'careermate.db'
+ARCHIVE_DIR = os.getenv('CAREERMATE_ARCHIVE_DIR', 'archive')
+RETENTION_DAYS = int(os.getenv('CAREERMATE_RETENTION_DAYS', '90'))
+RETENTION_INTERVAL_SECONDS = int(os.getenv('CAREERMATE_RETENTION_INTERVAL', '3600'))
+BATCH_SIZE = 500
+BATCH_PAUSE_SECONDS = 0.2  # Give request handlers a window for the write lock between batches
+
+ARCHIVE_FILE_PATTERN = re.compile(r'^careermate-(\d{4})-(\d{2})\.db$')
+
+def response_hash(body):
+    """Content hash used to deduplicate bot_response bodies"""
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+def _zlib_decompress(blob):
+    return zlib.decompress(blob).decode('utf-8') if blob is not None else None
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def _ensure_column(conn, table, column, definition):
+    columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    if column not in columns:
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+def ensure_retention_schema(conn):
+    """Add the dedup table, reference column and read view to the live DB"""
+    # WAL lets the retention worker read and archive while requests keep writing
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS response_bodies (
+            hash TEXT PRIMARY KEY,
+            body TEXT NOT NULL
+        )
+    ''')
+    # Older careermate.db files predate the language/intent columns
+    _ensure_column(conn, 'chats', 'language', "TEXT DEFAULT 'en'")
+    _ensure_column(conn, 'chats', 'intent', 'TEXT')
+    _ensure_column(conn, 'chats', 'bot_response_hash', 'TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_chats_timestamp ON chats(timestamp)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_chats_response_hash ON chats(bot_response_hash)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_voice_timestamp ON voice_interactions(timestamp)')
+    conn.execute('''
+        CREATE VIEW IF NOT EXISTS chats_full AS
+        SELECT c.id, c.user_message, COALESCE(b.body, c.bot_response) AS bot_response,
+               c.language, c.intent, c.timestamp
+        FROM chats c LEFT JOIN response_bodies b ON b.hash = c.bot_response_hash
+    ''')
+    conn.commit()
+
+def record_chat(conn, user_message, bot_response, language, intent, timestamp):
+    """Insert a chat row, storing the bot response body by reference"""
+    body_hash = response_hash(bot_response)
+    conn.execute('INSERT OR IGNORE INTO response_bodies (hash, body) VALUES (?, ?)', (body_hash, bot_response))
+    conn.execute(
+        "INSERT INTO chats (user_message, bot_response, bot_response_hash, language, intent, timestamp) VALUES (?, '', ?, ?, ?, ?)",
+        (user_message, body_hash, language, intent, timestamp)
+    )
+    conn.commit()
+
+def archive_path(month, archive_dir=ARCHIVE_DIR):
+    """Archive file for a 'YYYY-MM' month"""
+    return os.path.join(archive_dir, f'careermate-{month}.db')
+
+def _open_archive(month, archive_dir):
+    os.makedirs(archive_dir, exist_ok=True)
+    conn = _connect(archive_path(month, archive_dir))
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS response_bodies (
+            hash TEXT PRIMARY KEY,
+            body BLOB NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS chats (
+            id INTEGER PRIMARY KEY,
+            user_message TEXT NOT NULL,
+            bot_response_hash TEXT NOT NULL,
+            language TEXT,
+            intent TEXT,
+            timestamp TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS voice_interactions (
+            id INTEGER PRIMARY KEY,
+            interaction_type TEXT NOT NULL,
+            language TEXT NOT NULL,
+            success BOOLEAN,
+            timestamp TEXT NOT NULL
+        )
+    ''')
+    return conn
+
+def dedupe_responses(conn, batch_size=BATCH_SIZE):
+    """Move inline bot_response bodies of one batch into response_bodies"""
+    rows = conn.execute(
+        "SELECT id, bot_response FROM chats WHERE bot_response_hash IS NULL LIMIT ?", (batch_size,)
+    ).fetchall()
+    for row in rows:
+        body_hash = response_hash(row['bot_response'])
+        conn.execute('INSERT OR IGNORE INTO response_bodies (hash, body) VALUES (?, ?)', (body_hash, row['bot_response']))
+        conn.execute("UPDATE chats SET bot_response = '', bot_response_hash = ? WHERE id = ?", (body_hash, row['id']))
+    conn.commit()
+    return len(rows)
+
+def _archive_chats_batch(conn, cutoff, archive_dir, batch_size):
+    rows = conn.execute('''
+        SELECT c.id, c.user_message, c.bot_response, c.bot_response_hash, c.language, c.intent, c.timestamp,
+               b.body
+        FROM chats c LEFT JOIN response_bodies b ON b.hash = c.bot_response_hash
+        WHERE c.timestamp < ?
+        ORDER BY c.timestamp
+        LIMIT ?
+    ''', (cutoff, batch_size)).fetchall()
+
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(row['timestamp'][:7], []).append(row)
+
+    # Archive first, delete second: a crash in between only re-archives rows, which INSERT OR IGNORE absorbs
+    for month, month_rows in by_month.items():
+        archive = _open_archive(month, archive_dir)
+        try:
+            for row in month_rows:
+                body = row['body'] if row['body'] is not None else row['bot_response']
+                body_hash = row['bot_response_hash'] or response_hash(body)
+                archive.execute(
+                    'INSERT OR IGNORE INTO response_bodies (hash, body) VALUES (?, ?)',
+                    (body_hash, zlib.compress(body.encode('utf-8'), 9))
+                )
+                archive.execute(
+                    'INSERT OR IGNORE INTO chats (id, user_message, bot_response_hash, language, intent, timestamp) VALUES (?, ?, ?, ?, ?, ?)',
+                    (row['id'], row['user_message'], body_hash, row['language'], row['intent'], row['timestamp'])
+                )
+            archive.commit()
+        finally:
+            archive.close()
+
+    conn.executemany('DELETE FROM chats WHERE id = ?', [(row['id'],) for row in rows])
+    conn.commit()
+    return len(rows)
+
+def _archive_voice_batch(conn, cutoff, archive_dir, batch_size):
+    rows = conn.execute(
+        'SELECT id, interaction_type, language, success, timestamp FROM voice_interactions WHERE timestamp < ? ORDER BY timestamp LIMIT ?',
+        (cutoff, batch_size)
+    ).fetchall()
+
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(row['timestamp'][:7], []).append(tuple(row))
+
+    for month, month_rows in by_month.items():
+        archive = _open_archive(month, archive_dir)
+        try:
+            archive.executemany(
+                'INSERT OR IGNORE INTO voice_interactions (id, interaction_type, language, success, timestamp) VALUES (?, ?, ?, ?, ?)',
+                month_rows
+            )
+            archive.commit()
+        finally:
+            archive.close()
+
+    conn.executemany('DELETE FROM voice_interactions WHERE id = ?', [(row['id'],) for row in rows])
+    conn.commit()
+    return len(rows)
+
+def _prune_response_bodies(conn):
+    deleted = conn.execute(
+        'DELETE FROM response_bodies WHERE hash NOT IN (SELECT bot_response_hash FROM chats WHERE bot_response_hash IS NOT NULL)'
+    ).rowcount
+    conn.commit()
+    return deleted
+
+def run_retention(db_path=DATABASE_PATH, archive_dir=ARCHIVE_DIR, retention_days=RETENTION_DAYS,
+                  batch_size=BATCH_SIZE, pause=BATCH_PAUSE_SECONDS, stop_event=None):
+    """One incremental retention pass: dedupe, archive expired rows, prune bodies"""
+    cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+    stats = {'deduped': 0, 'chats_archived': 0, 'voice_archived': 0, 'bodies_pruned': 0}
+
+    conn = _connect(db_path)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        missing = {'chats', 'voice_interactions'} - tables
+        if missing:
+            print(f"⚠️ Skipping retention: {db_path} has no {', '.join(sorted(missing))} table (run the app once to initialize it)")
+            return stats
+
+        ensure_retention_schema(conn)
+
+        # Each step commits per batch so writers only ever wait for one short transaction
+        for key, step in (
+            ('deduped', lambda: dedupe_responses(conn, batch_size)),
+            ('chats_archived', lambda: _archive_chats_batch(conn, cutoff, archive_dir, batch_size)),
+            ('voice_archived', lambda: _archive_voice_batch(conn, cutoff, archive_dir, batch_size)),
+        ):
+            while not (stop_event and stop_event.is_set()):
+                count = step()
+                stats[key] += count
+                if count < batch_size:
+                    break
+                time.sleep(pause)
+
+        stats['bodies_pruned'] = _prune_response_bodies(conn)
+        conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+    finally:
+        conn.close()
+
+    print(f"🗄️ Retention pass complete: {stats}")
+    return stats
+
+def start_retention_worker(db_path=DATABASE_PATH, archive_dir=ARCHIVE_DIR, retention_days=RETENTION_DAYS,
+                           interval=RETENTION_INTERVAL_SECONDS):
+    """Run retention passes on a daemon thread; set the returned event to stop it"""
+    stop_event = threading.Event()
+
+    def worker():
+        while not stop_event.is_set():
+            try:
+                run_retention(db_path, archive_dir, retention_days, stop_event=stop_event)
+            except Exception as e:
+                print(f"❌ Retention error: {e}")
+            stop_event.wait(interval)
+
+    threading.Thread(target=worker, name='careermate-retention', daemon=True).start()
+    return stop_event
+
+def list_archives(archive_dir=ARCHIVE_DIR):
+    """Archived months as sorted [('YYYY-MM', path)]"""
+    archives = []
+    for path in glob.glob(os.path.join(archive_dir, 'careermate-*.db')):
+        match = ARCHIVE_FILE_PATTERN.match(os.path.basename(path))
+        if match:
+            archives.append((f'{match.group(1)}-{match.group(2)}', path))
+    return sorted(archives)
+
+def _readonly_uri(path):
+    return 'file:' + os.path.abspath(path).replace('?', '%3f').replace('#', '%23') + '?mode=ro'
+
+def connect_with_archives(db_path=DATABASE_PATH, archive_dir=ARCHIVE_DIR, since=None, until=None):
+    """Read-only connection to the live DB with monthly archives attached.
+
+    Archives for months in ``since``..``until`` ('YYYY-MM', both inclusive,
+    either may be None) are attached as ``archive_YYYY_MM``; the temp views
+    ``all_chats`` and ``all_voice_interactions`` union live and archived rows
+    with bot responses expanded. SQLite caps attached databases, so a range
+    covering more months than that raises ValueError; query it in slices.
+    """
+    archives = [
+        (month, path) for month, path in list_archives(archive_dir)
+        if (since is None or month >= since) and (until is None or month <= until)
+    ]
+
+    conn = sqlite3.connect(_readonly_uri(db_path), uri=True)
+    conn.row_factory = sqlite3.Row
+    conn.create_function('zlib_decompress', 1, _zlib_decompress, deterministic=True)
+
+    chat_selects = [
+        'SELECT id, user_message, bot_response, language, intent, timestamp, NULL AS archive_month FROM main.chats_full'
+    ]
+    voice_selects = [
+        'SELECT id, interaction_type, language, success, timestamp, NULL AS archive_month FROM main.voice_interactions'
+    ]
+
+    for month, path in archives:
+        schema = 'archive_' + month.replace('-', '_')
+        try:
+            conn.execute(f'ATTACH DATABASE ? AS {schema}', (_readonly_uri(path),))
+        except sqlite3.OperationalError as e:
+            conn.close()
+            if 'too many attached databases' not in str(e):
+                raise
+            raise ValueError(
+                f"{len(archives)} archive months ({archives[0][0]}..{archives[-1][0]}) exceed SQLite's "
+                f"attached database limit; narrow the range with since/until"
+            ) from e
+        chat_selects.append(f'''
+            SELECT c.id, c.user_message, zlib_decompress(b.body) AS bot_response,
+                   c.language, c.intent, c.timestamp, '{month}' AS archive_month
+            FROM {schema}.chats c LEFT JOIN {schema}.response_bodies b ON b.hash = c.bot_response_hash
+        ''')
+        voice_selects.append(
+            f"SELECT id, interaction_type, language, success, timestamp, '{month}' AS archive_month FROM {schema}.voice_interactions"
+        )
+
+    conn.execute('CREATE TEMP VIEW all_chats AS ' + ' UNION ALL '.join(chat_selects))
+    conn.execute('CREATE TEMP VIEW all_voice_interactions AS ' + ' UNION ALL '.join(voice_selects))
+    return conn
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive old CareerMate chats and voice interactions')
+    parser.add_argument('--db', default=DATABASE_PATH, help='live database path')
+    parser.add_argument('--archive-dir', default=ARCHIVE_DIR, help='monthly archive directory')
+    parser.add_argument('--days', type=int, default=RETENTION_DAYS, help='keep rows newer than this many days live')
+    args = parser.parse_args()
+
+    run_retention(args.db, args.archive_dir, args.days)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_retention
+
+MONTHS = [f'2024-{month:02d}' for month in range(1, 13)]
+
+@pytest.fixture
+def archived_db(tmp_path):
+    db_path = str(tmp_path / 'careermate.db')
+    archive_dir = str(tmp_path / 'archive')
+
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE chats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_message TEXT NOT NULL,
+            bot_response TEXT NOT NULL,
+            language TEXT DEFAULT 'en',
+            intent TEXT,
+            timestamp TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE voice_interactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            interaction_type TEXT NOT NULL,
+            language TEXT NOT NULL,
+            success BOOLEAN DEFAULT TRUE,
+            timestamp TEXT NOT NULL
+        )
+    ''')
+    for month in MONTHS:
+        conn.execute(
+            'INSERT INTO chats (user_message, bot_response, language, intent, timestamp) VALUES (?, ?, ?, ?, ?)',
+            (f'salary {month}', 'Tech Salaries', 'en', 'salary', f'{month}-15T10:00:00')
+        )
+        conn.execute(
+            'INSERT INTO voice_interactions (interaction_type, language, success, timestamp) VALUES (?, ?, ?, ?)',
+            ('openai_tts', 'en', True, f'{month}-15T10:00:01')
+        )
+    conn.commit()
+    conn.close()
+
+    db_retention.run_retention(db_path, archive_dir, retention_days=0, pause=0)
+    return db_path, archive_dir
+
+def test_archives_one_file_per_month(archived_db):
+    db_path, archive_dir = archived_db
+    assert [month for month, _ in db_retention.list_archives(archive_dir)] == MONTHS
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT COUNT(*) FROM chats').fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM response_bodies').fetchone()[0] == 0
+    conn.close()
+
+def test_connect_with_archives_rejects_range_over_attach_limit(archived_db):
+    db_path, archive_dir = archived_db
+    with pytest.raises(ValueError, match='narrow the range'):
+        db_retention.connect_with_archives(db_path, archive_dir)
+
+def test_connect_with_archives_month_range(archived_db):
+    db_path, archive_dir = archived_db
+    total = 0
+    for since, until in (('2024-01', '2024-06'), ('2024-07', None)):
+        conn = db_retention.connect_with_archives(db_path, archive_dir, since=since, until=until)
+        rows = conn.execute('SELECT bot_response, archive_month FROM all_chats').fetchall()
+        assert {row['bot_response'] for row in rows} == {'Tech Salaries'}
+        assert conn.execute('SELECT COUNT(*) FROM all_voice_interactions').fetchone()[0] == len(rows)
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute('DELETE FROM main.chats')
+        conn.close()
+        total += len(rows)
+    assert total == len(MONTHS)
+
+def test_run_retention_skips_uninitialized_db(tmp_path):
+    db_path = str(tmp_path / 'careermate.db')
+    stats = db_retention.run_retention(db_path, str(tmp_path / 'archive'), retention_days=0, pause=0)
+    assert stats['chats_archived'] == 0
+    assert not os.path.exists(tmp_path / 'archive')
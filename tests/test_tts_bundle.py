@@ -0,0 +1,100 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tts_bundle
+
+LANGUAGES = {
+    'en': {'name': 'English', 'openai_voice': 'alloy'},
+    'hi': {'name': 'हिन्दी', 'openai_voice': 'nova'},
+}
+TEMPLATES = {
+    'greeting': '👋 **Hello!**\n\n• Job search\n• Skills',
+    'salary': '💰 **Tech Salaries**\n\nNegotiate!',
+}
+
+class FakeTTS:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, text, voice):
+        self.calls.append((text, voice))
+        return f'{voice}:{text}'.encode('utf-8')
+
+def fake_translate(text, language):
+    return f'({language}) {text}'
+
+def failing_translate(text, language):
+    raise RuntimeError('MyMemory error 429: MYMEMORY WARNING')
+
+def build(bundle_dir, synthesize, templates=TEMPLATES, translate=fake_translate):
+    return tts_bundle.build_bundle(templates, LANGUAGES, synthesize, translate, 'tts-1-hd', 0.9,
+                                   bundle_dir=str(bundle_dir), concurrency=2)
+
+def data_files(bundle_dir):
+    return sorted(name for name in os.listdir(bundle_dir) if name.endswith('.bin'))
+
+def test_second_run_synthesizes_nothing(tmp_path):
+    synthesize = FakeTTS()
+    assert build(tmp_path, synthesize)
+    assert len(synthesize.calls) == 4
+
+    rerun = FakeTTS()
+    assert build(tmp_path, rerun)
+    assert rerun.calls == []
+
+def test_changed_template_regenerates_only_its_clips_and_compacts(tmp_path):
+    build(tmp_path, FakeTTS())
+    assert data_files(tmp_path) == ['audio-0.bin']
+
+    synthesize = FakeTTS()
+    assert build(tmp_path, synthesize, dict(TEMPLATES, salary='💰 **Pay**'))
+    assert sorted(voice for _, voice in synthesize.calls) == ['alloy', 'nova']
+    assert all('Pay' in text for text, _ in synthesize.calls)
+    assert data_files(tmp_path) == ['audio-1.bin']
+
+    index = tts_bundle.load_index(str(tmp_path))
+    size = os.path.getsize(tmp_path / 'audio-1.bin')
+    assert sum(entry['length'] for entry in index['entries'].values()) == size
+    assert tts_bundle.lookup_bundled_speech('👋 Hello! Job search Skills', 'en', 'alloy', 'tts-1-hd', 0.9,
+                                            bundle_dir=str(tmp_path)) == 'alloy:👋 Hello! Job search Skills'.encode('utf-8')
+
+def test_failed_strict_translation_is_not_recorded(tmp_path):
+    assert not build(tmp_path, FakeTTS(), translate=failing_translate)
+    index = tts_bundle.load_index(str(tmp_path))
+    assert index['translations'] == {}
+    assert sorted(index['entries']) == ['template:greeting|en|alloy', 'template:salary|en|alloy']
+
+    # The next run retries the missing translations
+    synthesize = FakeTTS()
+    assert build(tmp_path, synthesize)
+    assert sorted(voice for _, voice in synthesize.calls) == ['nova', 'nova']
+
+def test_lookup_matches_ui_cleaned_text(tmp_path):
+    build(tmp_path, FakeTTS())
+    stored = tts_bundle.get_template_translation('salary', 'hi', TEMPLATES['salary'], bundle_dir=str(tmp_path))
+    assert stored == '(hi) 💰 **Tech Salaries**\n\nNegotiate!'
+
+    # The web UI strips markdown and collapses newlines before calling /api/speak
+    audio = tts_bundle.lookup_bundled_speech('(hi) 💰 Tech Salaries Negotiate!', 'hi', 'nova', 'tts-1-hd', 0.9,
+                                             bundle_dir=str(tmp_path))
+    assert audio == 'nova:(hi) 💰 Tech Salaries Negotiate!'.encode('utf-8')
+    assert tts_bundle.lookup_bundled_speech('(hi) 💰 Tech Salaries Negotiate!', 'hi', 'alloy', 'tts-1-hd', 0.9,
+                                            bundle_dir=str(tmp_path)) is None
+
+def test_get_ai_response_uses_stored_translation_only_for_current_template(tmp_path, monkeypatch):
+    for module in ('flask', 'openai', 'dotenv'):
+        pytest.importorskip(module)
+    import app
+
+    monkeypatch.chdir(tmp_path)
+    build(tts_bundle.TTS_BUNDLE_DIR, FakeTTS(), {'salary': app.RESPONSE_TEMPLATES['salary']})
+    monkeypatch.setattr(app, 'translate_text_smart', lambda text, language, strict=False: 'live translation')
+
+    assert app.get_ai_response('salary', 'hi') == fake_translate(app.RESPONSE_TEMPLATES['salary'], 'hi')
+
+    monkeypatch.setitem(app.RESPONSE_TEMPLATES, 'salary', '💰 **Updated salaries**')
+    assert app.get_ai_response('salary', 'hi') == 'live translation'
@@ -0,0 +1,300 @@
+"""Packed bundle of pre-synthesized TTS audio for the fixed bot texts.
+
+The bundle is a directory holding one append-only data file with the MP3
+bytes back to back, plus ``index.json`` mapping each entry to its offset and
+length. The index also stores the translation of every response template, and
+``get_ai_response`` answers with those stored strings, so the text the chat
+returns is exactly the text that was synthesized. ``/api/speak`` looks texts
+up with ``lookup_bundled_speech``; the bundle is (re)built offline with:
+
+    python tts_bundle.py --concurrency 4
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+TTS_BUNDLE_DIR = 'tts_bundle'
+INDEX_FILENAME = 'index.json'
+BUNDLE_VERSION = 1
+
+_cache_lock = threading.Lock()
+# (data_path, lookup, translations) are swapped as one tuple so a reader never mixes two index versions
+_bundle_cache = {'key': None, 'snapshot': (None, {}, {})}
+
+def clean_text_for_speech(text):
+    """Normalize text the same way the web UI does before calling /api/speak"""
+    text = text.replace('**', '').replace('###', '').replace('•', '')
+    text = re.sub(r'\[.*?\]', '', text)
+    text = re.sub(r'\n+', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+def _sha256(*parts):
+    return hashlib.sha256('\x1f'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+def speech_key(text, language, voice, model, speed):
+    """Lookup key for the exact audio /api/speak would produce"""
+    return _sha256(language, voice, model, speed, clean_text_for_speech(text))
+
+def source_hash(source_text, language, voice, model, speed):
+    """Hash of everything an entry's audio is derived from"""
+    return _sha256(BUNDLE_VERSION, language, voice, model, speed, source_text)
+
+def translation_hash(english_text):
+    """Hash of the English template a stored translation was made from"""
+    return _sha256(english_text)
+
+def _index_path(bundle_dir):
+    return os.path.join(bundle_dir, INDEX_FILENAME)
+
+def load_index(bundle_dir=TTS_BUNDLE_DIR):
+    """Read the bundle index, or return an empty one"""
+    try:
+        with open(_index_path(bundle_dir), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') == BUNDLE_VERSION:
+            index.setdefault('translations', {})
+            return index
+        print(f"⚠️ Ignoring TTS bundle index with version {index.get('version')}")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"❌ TTS bundle index error: {e}")
+    return {'version': BUNDLE_VERSION, 'generation': 0, 'data_file': 'audio-0.bin', 'entries': {}, 'translations': {}}
+
+def save_index(index, bundle_dir=TTS_BUNDLE_DIR):
+    """Atomically replace the bundle index"""
+    tmp_path = _index_path(bundle_dir) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, _index_path(bundle_dir))
+
+def _bundle_snapshot(bundle_dir):
+    """Current (data_path, lookup, translations), reloaded when the index changes"""
+    try:
+        mtime = os.stat(_index_path(bundle_dir)).st_mtime_ns
+    except OSError:
+        mtime = None
+
+    with _cache_lock:
+        if (bundle_dir, mtime) != _bundle_cache['key']:
+            lookup = {}
+            translations = {}
+            data_path = None
+            if mtime is not None:
+                index = load_index(bundle_dir)
+                data_path = os.path.join(bundle_dir, index['data_file'])
+                for entry in index['entries'].values():
+                    lookup[entry['speech_key']] = (entry['offset'], entry['length'])
+                translations = index['translations']
+                print(f"📦 Loaded TTS bundle: {len(lookup)} clips, {len(translations)} translations")
+
+            _bundle_cache.update(key=(bundle_dir, mtime), snapshot=(data_path, lookup, translations))
+        return _bundle_cache['snapshot']
+
+def lookup_bundled_speech(text, language, voice, model, speed, bundle_dir=TTS_BUNDLE_DIR):
+    """Return pre-synthesized MP3 bytes for text, or None if it is not bundled"""
+    try:
+        data_path, lookup, _ = _bundle_snapshot(bundle_dir)
+        location = lookup.get(speech_key(text, language, voice, model, speed))
+        if not location:
+            return None
+
+        offset, length = location
+        with open(data_path, 'rb') as f:
+            f.seek(offset)
+            audio = f.read(length)
+        return audio if len(audio) == length else None
+    except Exception as e:
+        print(f"❌ TTS bundle read error: {e}")
+        return None
+
+def get_template_translation(intent, language, english_text, bundle_dir=TTS_BUNDLE_DIR):
+    """Stored translation of a response template, or None if missing or outdated"""
+    try:
+        _, _, translations = _bundle_snapshot(bundle_dir)
+        stored = translations.get(f'{intent}|{language}')
+        if stored and stored['source_hash'] == translation_hash(english_text):
+            return stored['text']
+    except Exception as e:
+        print(f"❌ TTS bundle translation error: {e}")
+    return None
+
+def _remove_orphan_data_files(index, bundle_dir):
+    """Delete data files left behind by a compaction that died before cleanup"""
+    for path in glob.glob(os.path.join(bundle_dir, 'audio-*.bin')):
+        if os.path.basename(path) != index['data_file']:
+            print(f"🧹 Removing orphaned TTS data file {os.path.basename(path)}")
+            os.remove(path)
+
+def _truncate_to_index(index, data_path):
+    """Drop bytes past the last indexed clip (left behind by an interrupted run)"""
+    end = max((e['offset'] + e['length'] for e in index['entries'].values()), default=0)
+    with open(data_path, 'ab') as f:
+        if f.tell() > end:
+            print(f"✂️ Discarding {f.tell() - end} unindexed bytes from interrupted run")
+            f.truncate(end)
+    return end
+
+def compact_bundle(index, bundle_dir=TTS_BUNDLE_DIR):
+    """Rewrite live clips into a fresh data file and drop the old one"""
+    old_path = os.path.join(bundle_dir, index['data_file'])
+    generation = index['generation'] + 1
+    new_file = f'audio-{generation}.bin'
+    new_entries = {}
+
+    with open(old_path, 'rb') as src, open(os.path.join(bundle_dir, new_file), 'wb') as dst:
+        for entry_id, entry in sorted(index['entries'].items(), key=lambda item: item[1]['offset']):
+            src.seek(entry['offset'])
+            audio = src.read(entry['length'])
+            new_entries[entry_id] = dict(entry, offset=dst.tell())
+            dst.write(audio)
+        dst.flush()
+        os.fsync(dst.fileno())
+
+    index = dict(index, generation=generation, data_file=new_file, entries=new_entries)
+    save_index(index, bundle_dir)
+    os.remove(old_path)
+    print(f"🗜️ Compacted TTS bundle into {new_file}")
+    return index
+
+def build_bundle(response_templates, languages, synthesize, translate, model, speed,
+                 bundle_dir=TTS_BUNDLE_DIR, concurrency=4, force=False):
+    """Synthesize every (template, language, voice) whose source or spoken text changed.
+
+    ``translate`` must raise rather than fall back to English; only clean
+    translations are stored. Progress is committed to the index after every
+    clip, so an interrupted run resumes where it stopped.
+    """
+    os.makedirs(bundle_dir, exist_ok=True)
+    index = load_index(bundle_dir)
+    _remove_orphan_data_files(index, bundle_dir)
+    data_path = os.path.join(bundle_dir, index['data_file'])
+    _truncate_to_index(index, data_path)
+
+    jobs = {}
+    for intent, english_text in response_templates.items():
+        for language, config in languages.items():
+            voice = config['openai_voice']
+            translation_key = f'{intent}|{language}'
+            if language == 'en':
+                spoken_text = english_text
+            else:
+                stored = index['translations'].get(translation_key)
+                valid = stored and stored['source_hash'] == translation_hash(english_text)
+                spoken_text = stored['text'] if valid else None
+            jobs[f'template:{intent}|{language}|{voice}'] = {
+                'source': f'template:{intent}',
+                'language': language,
+                'voice': voice,
+                'english_text': english_text,
+                'translation_key': translation_key,
+                'spoken_text': spoken_text,
+                'source_hash': source_hash(english_text, language, voice, model, speed),
+            }
+
+    stale = [entry_id for entry_id in index['entries'] if entry_id not in jobs]
+    for entry_id in stale:
+        del index['entries'][entry_id]
+    translation_keys = {job['translation_key'] for job in jobs.values()}
+    for key in [key for key in index['translations'] if key not in translation_keys]:
+        del index['translations'][key]
+
+    def is_current(job_id, job):
+        entry = index['entries'].get(job_id)
+        return (
+            entry is not None
+            and job['spoken_text'] is not None
+            and entry['source_hash'] == job['source_hash']
+            and entry['speech_key'] == speech_key(job['spoken_text'], job['language'], job['voice'], model, speed)
+        )
+
+    pending = [job_id for job_id, job in jobs.items() if force or not is_current(job_id, job)]
+    replaced = sum(1 for job_id in pending if job_id in index['entries'])
+    print(f"🎯 {len(jobs)} clips total, {len(jobs) - len(pending)} up to date, {len(pending)} to synthesize")
+
+    def render(job):
+        text = job['spoken_text']
+        if text is None:
+            text = translate(job['english_text'], job['language'])
+            if not text.strip() or text == job['english_text']:
+                raise RuntimeError('translation unavailable')
+        return text, synthesize(clean_text_for_speech(text), job['voice'])
+
+    done = failed = 0
+    # Workers only call the APIs; this thread is the single writer of data and index
+    with open(data_path, 'ab') as data_file, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(render, jobs[job_id]): job_id for job_id in pending}
+        for future in as_completed(futures):
+            job_id = futures[future]
+            job = jobs[job_id]
+            try:
+                spoken_text, audio = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"❌ {job_id}: {e}")
+                continue
+
+            if job['spoken_text'] is None:
+                index['translations'][job['translation_key']] = {
+                    'source_hash': translation_hash(job['english_text']),
+                    'text': spoken_text,
+                }
+
+            offset = data_file.tell()
+            data_file.write(audio)
+            data_file.flush()
+            os.fsync(data_file.fileno())
+
+            index['entries'][job_id] = {
+                'source': job['source'],
+                'language': job['language'],
+                'voice': job['voice'],
+                'source_hash': job['source_hash'],
+                'speech_key': speech_key(spoken_text, job['language'], job['voice'], model, speed),
+                'offset': offset,
+                'length': len(audio),
+            }
+            save_index(index, bundle_dir)
+            done += 1
+            print(f"✅ [{done + failed}/{len(pending)}] {job_id} ({len(audio)} bytes)")
+
+    if stale or replaced:
+        index = compact_bundle(index, bundle_dir)
+    else:
+        save_index(index, bundle_dir)
+
+    print(f"📦 TTS bundle ready: {done} synthesized, {failed} failed, {len(index['entries'])} clips")
+    return failed == 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-synthesize TTS audio for all CareerMate response templates')
+    parser.add_argument('--bundle-dir', default=TTS_BUNDLE_DIR, help='bundle output directory')
+    parser.add_argument('--concurrency', type=int, default=4, help='maximum parallel TTS requests')
+    parser.add_argument('--force', action='store_true', help='re-synthesize every clip')
+    args = parser.parse_args()
+
+    import app
+
+    ok = build_bundle(
+        app.RESPONSE_TEMPLATES,
+        app.LANGUAGES,
+        synthesize=app.synthesize_speech,
+        translate=lambda text, language: app.translate_text_smart(text, language, strict=True),
+        model=app.TTS_MODEL,
+        speed=app.TTS_SPEED,
+        bundle_dir=args.bundle_dir,
+        concurrency=max(1, args.concurrency),
+        force=args.force,
+    )
+    raise SystemExit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()